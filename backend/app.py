@@ -1,31 +1,32 @@
 from flask import Flask, send_from_directory
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
+from extensions import limiter
 from routes.review_routes import review_bp
 from models import init_db
+import logging
+import orjson
 import os
 
+# Quiet by default; set LOG_LEVEL=DEBUG to trace LLM requests
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'WARNING').upper())
+
+class ORJSONProvider(JSONProvider):
+    """JSON provider backed by orjson for faster jsonify and request parsing"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 # Create Flask app
 app = Flask(__name__, static_folder='../frontend', static_url_path='')
+app.json = ORJSONProvider(app)
 CORS(app)
 
 # Configure rate limiting
-limiter = Limiter(
-    app=app,
-    key_func=get_remote_address,
-    default_limits=["100 per hour"],
-    storage_uri="memory://"
-)
-
-# Apply rate limit to review endpoint
-@limiter.limit("10 per minute")
-@app.before_request
-def rate_limit_review():
-    """Rate limit the review endpoint specifically"""
-    from flask import request
-    if request.path == '/api/review' and request.method == 'POST':
-        pass  # Rate limit will be applied by decorator
+limiter.init_app(app)
 
 # Register blueprints
 app.register_blueprint(review_bp)
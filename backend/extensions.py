@@ -0,0 +1,20 @@
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from limits import parse
+import os
+
+# Configure rate limiting; bound to the app in app.py so blueprints can
+# decorate their routes without importing the app. Set REDIS_URL so all
+# gunicorn workers share one counter; memory:// is per process.
+limiter = Limiter(
+    key_func=get_remote_address,
+    default_limits=["100 per hour"],
+    storage_uri=os.getenv('REDIS_URL') or "memory://",
+    strategy="moving-window"
+)
+
+# Budget for generating reviews, shared by the single and batch endpoints
+REVIEW_RATE_LIMIT = os.getenv('REVIEW_RATE_LIMIT', '10 per minute')
+REVIEW_LIMIT_SCOPE = 'review'
+# Reviews allowed per window; a batch larger than this could never pass
+REVIEW_LIMIT_AMOUNT = parse(REVIEW_RATE_LIMIT).amount
@@ -0,0 +1,11 @@
+import os
+
+# Gunicorn configuration for production deployments.
+# The gevent worker monkey-patches the stdlib before the app is imported,
+# so blocking `requests` calls to the LLM API yield instead of pinning a worker.
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+worker_class = 'gevent'
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+worker_connections = int(os.getenv('WORKER_CONNECTIONS', 1000))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+accesslog = '-'
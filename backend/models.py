@@ -1,6 +1,5 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, Float, DateTime
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event, Column, Integer, String, Text, Float, DateTime, Index
+from sqlalchemy.orm import declarative_base, sessionmaker
 from datetime import datetime
 import os
 from dotenv import load_dotenv
@@ -20,7 +19,12 @@ class CodeReview(Base):
     suggestions = Column(Text)
     potential_bugs = Column(Text)
     quality_score = Column(Float, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    # Serves the language-filtered, newest-first review listing
+    __table_args__ = (
+        Index('ix_reviews_lang_created', 'language', 'created_at'),
+    )
     
     def to_dict(self):
         """Convert model to dictionary"""
@@ -35,14 +39,70 @@ class CodeReview(Base):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class ReviewCache(Base):
+    """Model for caching LLM reviews by code content"""
+    __tablename__ = 'review_cache'
+    
+    code_hash = Column(String(32), primary_key=True)
+    language = Column(String(50), primary_key=True)
+    review_json = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ReviewJob(Base):
+    """Model for tracking background code review jobs"""
+    __tablename__ = 'review_jobs'
+    
+    id = Column(String(32), primary_key=True)
+    status = Column(String(20), nullable=False, default='queued')
+    review_id = Column(Integer)
+    result_json = Column(Text)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convert model to dictionary"""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'review_id': self.review_id,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
 # Database setup
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///code_reviews.db')
-engine = create_engine(DATABASE_URL, echo=False)
-SessionLocal = sessionmaker(bind=engine)
+IS_SQLITE = DATABASE_URL.startswith('sqlite')
+
+# Larger compiled-statement cache so every filter combination stays cached.
+# SQLite connections are pooled and may be used from background job threads.
+engine = create_engine(
+    DATABASE_URL,
+    echo=False,
+    query_cache_size=1200,
+    connect_args={'check_same_thread': False} if IS_SQLITE else {}
+)
+# Services flush explicitly and serialize rows before committing, so neither
+# autoflush nor expiring (and later reloading) objects on commit is needed
+SessionLocal = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+if IS_SQLITE:
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragma(dbapi_conn, _):
+        """Use WAL so commits skip the full fsync and readers don't block writers"""
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
 
 def init_db():
     """Initialize database tables"""
     Base.metadata.create_all(bind=engine)
+    # create_all skips indexes on tables that already exist
+    for index in CodeReview.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
 
 def get_db():
     """Get database session"""
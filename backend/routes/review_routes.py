@@ -1,10 +1,17 @@
 from flask import Blueprint, request, jsonify
+from extensions import limiter, REVIEW_RATE_LIMIT, REVIEW_LIMIT_SCOPE, REVIEW_LIMIT_AMOUNT
 from services.review_service import ReviewService
+from services.job_service import JobService
 
 review_bp = Blueprint('reviews', __name__)
-review_service = ReviewService()
+# A batch is charged one hit per item, so it must fit in one limit window
+review_service = ReviewService(
+    max_batch_size=min(ReviewService.MAX_BATCH_SIZE, REVIEW_LIMIT_AMOUNT)
+)
+job_service = JobService(review_service)
 
 @review_bp.route('/api/review', methods=['POST'])
+@limiter.shared_limit(REVIEW_RATE_LIMIT, scope=REVIEW_LIMIT_SCOPE)
 def create_review():
     """
     Create a new code review
@@ -14,9 +21,12 @@ def create_review():
             "code": "code snippet",
             "language": "python"
         }
+    
+    Send "Prefer: respond-async" to get a 202 with a job to poll at
+    /api/review/<job_id> instead of waiting for the LLM.
     """
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True)
         
         if not data:
             return jsonify({'error': 'Request body must be JSON'}), 400
@@ -30,6 +40,15 @@ def create_review():
         if not language:
             return jsonify({'error': 'Programming language is required'}), 400
         
+        # Queue the review when the client opts in to polling
+        if 'respond-async' in request.headers.get('Prefer', ''):
+            job = job_service.submit_review(code, language)
+            
+            return jsonify({
+                'success': True,
+                'job': job
+            }), 202, {'Location': f"/api/review/{job['id']}"}
+        
         # Create review
         review = review_service.create_review(code, language)
         
@@ -45,6 +64,79 @@ def create_review():
         return jsonify({'error': f'Failed to create review: {str(e)}'}), 500
 
 
+def _batch_cost():
+    """Charge the review rate limit one hit per snippet"""
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else None
+    
+    # Batches the view rejects with 400 are not charged, so an oversized
+    # batch reports "Too many items" instead of a rate limit error
+    if not isinstance(items, list) or not items or len(items) > review_service.max_batch_size:
+        return 0
+    
+    return len(items)
+
+
+@review_bp.route('/api/review/batch', methods=['POST'])
+@limiter.shared_limit(REVIEW_RATE_LIMIT, scope=REVIEW_LIMIT_SCOPE, cost=_batch_cost)
+def create_review_batch():
+    """
+    Create code reviews for several snippets in one request
+    
+    Request body:
+        {
+            "items": [
+                {"code": "code snippet", "language": "python"},
+                ...
+            ]
+        }
+    """
+    try:
+        data = request.get_json(silent=True)
+        
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be JSON'}), 400
+        
+        results = review_service.create_review_batch(data.get('items'))
+        
+        return jsonify({
+            'success': True,
+            'results': results
+        }), 200
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    except Exception as e:
+        return jsonify({'error': f'Failed to create reviews: {str(e)}'}), 500
+
+
+@review_bp.route('/api/review/<job_id>', methods=['GET'])
+@limiter.exempt
+def get_review_job(job_id):
+    """
+    Get the status of a background review job
+    
+    Exempt from rate limiting since clients are expected to poll it.
+    
+    Path parameters:
+        - job_id: Job ID returned by POST /api/review
+    """
+    try:
+        job = job_service.get_job(job_id)
+        
+        return jsonify({
+            'success': True,
+            'job': job
+        }), 200
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    
+    except Exception as e:
+        return jsonify({'error': f'Failed to fetch job: {str(e)}'}), 500
+
+
 @review_bp.route('/api/reviews', methods=['GET'])
 def get_reviews():
     """
@@ -56,6 +148,7 @@ def get_reviews():
         - language: Filter by language
         - start_date: Filter by start date (ISO format)
         - end_date: Filter by end date (ISO format)
+        - cursor: next_cursor from a previous page (faster than page for deep pages)
     """
     try:
         # Get query parameters
@@ -64,6 +157,7 @@ def get_reviews():
         language = request.args.get('language')
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
+        cursor = request.args.get('cursor')
         
         # Validate pagination
         if page < 1:
@@ -78,7 +172,8 @@ def get_reviews():
             per_page=per_page,
             language=language,
             start_date=start_date,
-            end_date=end_date
+            end_date=end_date,
+            cursor=cursor
         )
         
         return jsonify({
@@ -86,6 +181,9 @@ def get_reviews():
             'data': result
         }), 200
     
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     except Exception as e:
         return jsonify({'error': f'Failed to fetch reviews: {str(e)}'}), 500
 
@@ -0,0 +1,111 @@
+from models import ReviewJob, SessionLocal
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import update
+import logging
+import orjson
+import os
+import uuid
+
+log = logging.getLogger(__name__)
+
+class JobService:
+    """Service for running code reviews in the background"""
+    
+    def __init__(self, review_service):
+        self.review_service = review_service
+        # Under the gunicorn gevent worker these threads are greenlets
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('REVIEW_WORKERS', 4)),
+            thread_name_prefix='review-job'
+        )
+    
+    def submit_review(self, code: str, language: str) -> dict:
+        """
+        Queue a code review to run in the background
+        
+        Args:
+            code: Code snippet to review
+            language: Programming language
+            
+        Returns:
+            dict: Job data
+        """
+        # Reject bad input now rather than in a job nobody is waiting on
+        is_valid, error_msg = self.review_service.validate_input(code, language)
+        if not is_valid:
+            raise ValueError(error_msg)
+        
+        db = SessionLocal()
+        try:
+            job = ReviewJob(id=uuid.uuid4().hex, status='queued')
+            db.add(job)
+            db.flush()
+            result = job.to_dict()
+            db.commit()
+        
+        except Exception as e:
+            db.rollback()
+            raise Exception(f"Database error: {str(e)}")
+        finally:
+            db.close()
+        
+        self._executor.submit(self._run_review, result['id'], code, language)
+        return result
+    
+    def get_job(self, job_id: str) -> dict:
+        """
+        Get the status of a review job, including the review once finished
+        
+        Args:
+            job_id: Job ID
+            
+        Returns:
+            dict: Job data
+        """
+        db = SessionLocal()
+        try:
+            job = db.get(ReviewJob, job_id)
+            
+            if not job:
+                raise ValueError(f"Job with ID {job_id} not found")
+            
+            result = job.to_dict()
+            if job.result_json:
+                result['review'] = orjson.loads(job.result_json)
+            
+            return result
+        
+        finally:
+            db.close()
+    
+    def _run_review(self, job_id: str, code: str, language: str) -> None:
+        """Run a queued review and record its outcome on the job"""
+        try:
+            self._update_job(job_id, status='running')
+            review = self.review_service.create_review(code, language)
+            self._update_job(
+                job_id,
+                status='finished',
+                review_id=review['id'],
+                result_json=orjson.dumps(review).decode()
+            )
+        
+        except Exception as e:
+            # Nobody awaits the executor future, so record the failure on
+            # the job instead of leaving it queued or running forever
+            try:
+                self._update_job(job_id, status='failed', error=str(e))
+            except Exception:
+                log.exception("Failed to record failure of review job %s", job_id)
+    
+    def _update_job(self, job_id: str, **values) -> None:
+        """Update the stored state of a job"""
+        db = SessionLocal()
+        try:
+            db.execute(update(ReviewJob).where(ReviewJob.id == job_id).values(**values))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
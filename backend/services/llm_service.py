@@ -1,37 +1,23 @@
+import logging
 import os
 import requests
-import json
+from requests.adapters import HTTPAdapter
+import orjson
+import random
+import re
 import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
-class LLMService:
-    """Service for interacting with LLM API"""
-    
-    def __init__(self):
-        self.api_key = os.getenv('LLM_API_KEY')
-        self.base_url = os.getenv('LLM_BASE_URL')
-        self.model = os.getenv('LLM_MODEL', 'gpt-4o-mini')
-        self.test_mode = os.getenv('TEST_MODE', 'false').lower() == 'true'
-        
-        if not self.api_key or not self.base_url:
-            raise ValueError("LLM_API_KEY and LLM_BASE_URL must be set in environment variables")
-        
-        if self.test_mode:
-            print("⚠️  WARNING: Running in TEST MODE - using mock reviews")
-    
-    def create_review_prompt(self, code: str, language: str) -> str:
-        """Create a structured prompt for code review"""
-        prompt = f"""You are an expert code reviewer. Analyze the following {language} code and provide a comprehensive review.
+log = logging.getLogger(__name__)
 
-Code to review:
-```{language}
-{code}
-```
+# Matches a fenced code block (optionally tagged json) around the LLM's JSON
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.S)
 
-Please provide your review in the following JSON format:
-{{
+# Static part of the review prompt, built once rather than formatted per request
+_REVIEW_INSTRUCTIONS = """Please provide your review in the following JSON format:
+{
     "quality_score": <number between 1-10>,
     "summary": "<brief summary of the code>",
     "potential_bugs": [
@@ -47,7 +33,7 @@ Please provide your review in the following JSON format:
         "<strength 2>"
     ],
     "reasoning": "<explanation of the quality score>"
-}}
+}
 
 Focus on:
 1. Code quality and best practices
@@ -57,7 +43,108 @@ Focus on:
 5. Readability and maintainability
 
 Be specific and actionable in your feedback."""
-        return prompt
+
+# Mock review heuristics, compiled once instead of rebuilt on every review
+_SEMICOLON_LANGUAGES = frozenset({'java', 'javascript', 'c++', 'c', 'typescript'})
+_ERROR_HANDLING_LANGUAGES = frozenset({'java', 'python', 'javascript'})
+_BRACE_ONLY_LINES = frozenset({'{', '}', '};'})
+_STATEMENT_RE = re.compile(r"System\.out|console\.|printf|cout|return|int |String |var |let |const ")
+_BLOCK_RE = re.compile(r"class |function|if |for |while ")
+
+class _JSONObjectScanner:
+    """Detects when streamed text contains a complete JSON review object"""
+    
+    def __init__(self):
+        self.buffer = ''
+        self.text = None
+        self._pos = 0
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+    
+    def feed(self, chunk: str) -> bool:
+        """Add streamed text; returns True once self.text holds a parsed object"""
+        self.buffer += chunk
+        
+        while self._pos < len(self.buffer):
+            char = self.buffer[self._pos]
+            self._pos += 1
+            
+            if self._start is None:
+                if char == '{':
+                    self._start = self._pos - 1
+                    self._depth = 1
+                continue
+            
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    candidate = self.buffer[self._start:self._pos]
+                    try:
+                        parsed = orjson.loads(candidate)
+                    except orjson.JSONDecodeError:
+                        # A brace in prose, not the review; look for the next one
+                        self._pos = self._start + 1
+                        self._start = None
+                        continue
+                    if not isinstance(parsed, dict) or 'quality_score' not in parsed:
+                        # JSON quoted in prose, such as {}; skip past all of it
+                        self._start = None
+                        continue
+                    self.text = candidate
+                    return True
+        
+        return False
+
+class LLMService:
+    """Service for interacting with LLM API"""
+    
+    def __init__(self):
+        self.api_key = os.getenv('LLM_API_KEY')
+        self.base_url = os.getenv('LLM_BASE_URL')
+        self.model = os.getenv('LLM_MODEL', 'gpt-4o-mini')
+        self.test_mode = os.getenv('TEST_MODE', 'false').lower() == 'true'
+        self.stream = os.getenv('LLM_STREAM', 'true').lower() == 'true'
+        
+        if not self.api_key or not self.base_url:
+            raise ValueError("LLM_API_KEY and LLM_BASE_URL must be set in environment variables")
+        
+        if self.test_mode:
+            log.warning("Running in TEST MODE - using mock reviews")
+        
+        # Reuse pooled keep-alive connections to the LLM API across requests
+        # and retries instead of paying a TCP/TLS handshake on every call
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=0)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        # Try different header formats for LiteLLM proxy
+        self._session.headers.update({
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {self.api_key}',
+            'api-key': self.api_key,  # Some proxies use this
+        })
+    
+    def create_review_prompt(self, code: str, language: str) -> str:
+        """Create a structured prompt for code review"""
+        return (
+            f"You are an expert code reviewer. Analyze the following {language} code "
+            "and provide a comprehensive review.\n\n"
+            f"Code to review:\n```{language}\n{code}\n```\n\n"
+            + _REVIEW_INSTRUCTIONS
+        )
     
     def review_code(self, code: str, language: str, max_retries: int = 3) -> dict:
         """
@@ -77,13 +164,6 @@ Be specific and actionable in your feedback."""
         
         prompt = self.create_review_prompt(code, language)
         
-        # Try different header formats for LiteLLM proxy
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {self.api_key}',
-            'api-key': self.api_key,  # Some proxies use this
-        }
-        
         payload = {
             'model': self.model,
             'messages': [
@@ -93,49 +173,52 @@ Be specific and actionable in your feedback."""
                 }
             ],
             'temperature': 0.3,
-            'max_tokens': 1500
+            'max_tokens': 1500,
+            'stream': self.stream
         }
         
         last_error = None
         
         for attempt in range(max_retries):
             try:
-                print(f"Sending request to LLM API (attempt {attempt + 1}/{max_retries})...")
+                log.debug("Sending request to LLM API (attempt %d/%d)", attempt + 1, max_retries)
                 
-                response = requests.post(
+                response = self._session.post(
                     f'{self.base_url}/chat/completions',
-                    headers=headers,
-                    json=payload,
-                    timeout=30
+                    data=orjson.dumps(payload),
+                    timeout=30,
+                    stream=self.stream
                 )
                 
-                print(f"Response status: {response.status_code}")
-                print(f"Response text: {response.text[:200]}...")  # Print first 200 chars
+                log.debug("Response status: %s", response.status_code)
                 
                 if response.status_code == 200:
-                    result = response.json()
-                    content = result['choices'][0]['message']['content']
+                    try:
+                        content = self._read_content(response)
+                    except (orjson.JSONDecodeError, KeyError, IndexError, TypeError) as e:
+                        # e.g. a proxy's HTML error page served with a 200
+                        last_error = f"Invalid API response: {e!r}"
+                        if attempt < max_retries - 1:
+                            time.sleep(1)
+                        continue
                     
                     # Try to parse JSON from the response
                     try:
                         # Extract JSON if it's wrapped in code blocks
-                        if '```json' in content:
-                            json_start = content.find('```json') + 7
-                            json_end = content.find('```', json_start)
-                            content = content[json_start:json_end].strip()
-                        elif '```' in content:
-                            json_start = content.find('```') + 3
-                            json_end = content.find('```', json_start)
-                            content = content[json_start:json_end].strip()
+                        fence = _FENCE_RE.search(content)
+                        if fence:
+                            content = fence.group(1).strip()
                         
-                        parsed_review = json.loads(content)
+                        parsed_review = orjson.loads(content)
                         return self._format_review(parsed_review)
-                    except json.JSONDecodeError:
+                    except orjson.JSONDecodeError:
                         # If JSON parsing fails, create structured response from text
                         return self._create_fallback_review(content, language)
                 
                 elif response.status_code == 429:
-                    # Rate limit - wait and retry
+                    # Rate limit - read the body so the connection goes back
+                    # to the pool, then wait and retry
+                    response.content
                     wait_time = 2 ** attempt
                     time.sleep(wait_time)
                     last_error = f"Rate limit exceeded (attempt {attempt + 1}/{max_retries})"
@@ -162,6 +245,48 @@ Be specific and actionable in your feedback."""
         # All retries failed
         raise Exception(f"Failed to get code review after {max_retries} attempts. Last error: {last_error}")
     
+    def _read_content(self, response: requests.Response) -> str:
+        """Get the completion text from a streamed (SSE) or regular response"""
+        if 'text/event-stream' not in response.headers.get('Content-Type', ''):
+            # Not streamed, either by choice or because the proxy ignored it
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Response text: %s...", response.text[:200])
+            result = orjson.loads(response.content)
+            return result['choices'][0]['message']['content']
+        
+        scanner = _JSONObjectScanner()
+        done = False
+        try:
+            # Read to the end of the stream even after the review is complete;
+            # closing a partly read response drops its pooled connection
+            for line in response.iter_lines():
+                if done or not line.startswith(b'data:'):
+                    continue
+                
+                data = line[5:].strip()
+                if data == b'[DONE]':
+                    done = True
+                    continue
+                
+                try:
+                    chunk = orjson.loads(data)
+                except orjson.JSONDecodeError:
+                    continue
+                
+                # Skip anything that isn't a chat completion chunk object
+                choices = chunk.get('choices') if isinstance(chunk, dict) else None
+                if not isinstance(choices, list) or not choices or not isinstance(choices[0], dict):
+                    continue
+                
+                delta = (choices[0].get('delta') or {}).get('content')
+                # Stop collecting text as soon as the review object is complete
+                if delta and scanner.text is None:
+                    scanner.feed(delta)
+        finally:
+            response.close()
+        
+        return scanner.text if scanner.text is not None else scanner.buffer
+    
     def _format_review(self, parsed_review: dict) -> dict:
         """Format the parsed review into standard structure"""
         return {
@@ -170,14 +295,12 @@ Be specific and actionable in your feedback."""
             'suggestions': '\n'.join(parsed_review.get('suggestions', [])),
             'potential_bugs': '\n'.join(parsed_review.get('potential_bugs', [])),
             'strengths': parsed_review.get('strengths', []),
-            'reasoning': parsed_review.get('reasoning', '')
+            'reasoning': parsed_review.get('reasoning', ''),
+            'source': 'llm'
         }
     
     def _create_mock_review(self, code: str, language: str) -> dict:
         """Create a mock review for testing with basic code analysis"""
-        import random
-        import re
-        
         # Basic code analysis
         bugs = []
         suggestions = []
@@ -185,7 +308,8 @@ Be specific and actionable in your feedback."""
         
         # Check for common issues
         code_lower = code.lower()
-        lines = code.split('\n')
+        language_lower = language.lower()
+        lines = code.splitlines()
         
         # Common typos and errors
         if 'printIn' in code or 'printin' in code_lower:
@@ -193,29 +317,28 @@ Be specific and actionable in your feedback."""
             quality_score -= 2.0
         
         # Java/JavaScript/C++/C specific checks
-        if language.lower() in ['java', 'javascript', 'c++', 'c', 'typescript']:
+        if language_lower in _SEMICOLON_LANGUAGES:
             for i, line in enumerate(lines, 1):
                 line_stripped = line.strip()
-                # Skip empty lines, comments, and lines with braces only
-                if not line_stripped or line_stripped.startswith('//') or line_stripped.startswith('/*'):
-                    continue
-                if line_stripped in ['{', '}', '};']:
+                # Skip empty lines, comments, lines with braces only and
+                # lines that already end a statement or open a block
+                if (not line_stripped
+                        or line_stripped.startswith(('//', '/*'))
+                        or line_stripped in _BRACE_ONLY_LINES
+                        or line_stripped.endswith((';', '{', '}', ':'))):
                     continue
                 
-                # Check for missing semicolons
-                if line_stripped and not line_stripped.endswith((';', '{', '}', ':')):
-                    # Check if it's a statement that needs semicolon
-                    if any(keyword in line_stripped for keyword in ['System.out', 'console.', 'printf', 'cout', 'return', 'int ', 'String ', 'var ', 'let ', 'const ']):
-                        if 'class ' not in line_stripped and 'function' not in line_stripped and 'if ' not in line_stripped and 'for ' not in line_stripped and 'while ' not in line_stripped:
-                            bugs.append(f'Missing semicolon at line {i}: "{line_stripped}"')
-                            quality_score -= 1.5
-                            break  # Only report first one to avoid spam
+                # Check for a statement that needs a semicolon
+                if _STATEMENT_RE.search(line_stripped) and not _BLOCK_RE.search(line_stripped):
+                    bugs.append(f'Missing semicolon at line {i}: "{line_stripped}"')
+                    quality_score -= 1.5
+                    break  # Only report first one to avoid spam
         
         if 'system.out.print' in code_lower and 'println' not in code_lower and 'printf' not in code_lower:
             suggestions.append('Consider using println() instead of print() for better output formatting')
         
         # Check for missing error handling
-        if 'try' not in code_lower and 'catch' not in code_lower and language.lower() in ['java', 'python', 'javascript']:
+        if 'try' not in code_lower and 'catch' not in code_lower and language_lower in _ERROR_HANDLING_LANGUAGES:
             suggestions.append('Consider adding error handling (try-catch blocks)')
         
         # Check for missing comments
@@ -228,11 +351,11 @@ Be specific and actionable in your feedback."""
             suggestions.append('Consider using more descriptive variable names instead of single letters')
         
         # Language-specific checks
-        if language.lower() == 'python':
+        if language_lower == 'python':
             if 'def ' in code and '"""' not in code and "'''" not in code:
                 suggestions.append('Add docstrings to your functions')
         
-        if language.lower() == 'java':
+        if language_lower == 'java':
             if 'public class' in code and '/**' not in code:
                 suggestions.append('Add JavaDoc comments to your classes and methods')
             # Check for missing braces
@@ -260,7 +383,7 @@ Be specific and actionable in your feedback."""
         strengths = []
         if 'class' in code_lower:
             strengths.append('Uses object-oriented structure')
-        if len(code.split('\n')) > 5:
+        if len(lines) > 5:
             strengths.append('Well-organized multi-line code')
         if not bugs:
             strengths.append('No syntax errors detected')
@@ -271,7 +394,8 @@ Be specific and actionable in your feedback."""
             'suggestions': suggestions_text,
             'potential_bugs': bugs_text,
             'strengths': strengths,
-            'reasoning': f'Score based on: code structure ({len(bugs)} errors found), error detection, and best practices. Note: This is a simplified test mode review.'
+            'reasoning': f'Score based on: code structure ({len(bugs)} errors found), error detection, and best practices. Note: This is a simplified test mode review.',
+            'source': 'mock'
         }
     
     def _create_fallback_review(self, content: str, language: str) -> dict:
@@ -298,5 +422,6 @@ Be specific and actionable in your feedback."""
             'suggestions': 'See review text for suggestions',
             'potential_bugs': 'See review text for potential issues',
             'strengths': [],
-            'reasoning': content
+            'reasoning': content,
+            'source': 'fallback'
         }
\ No newline at end of file
@@ -1,16 +1,26 @@
-from models import CodeReview, SessionLocal
+from models import CodeReview, ReviewCache, SessionLocal
 from services.llm_service import LLMService
-from datetime import datetime
-from sqlalchemy import desc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import and_, delete, desc, func, or_, select
+from sqlalchemy.exc import IntegrityError
+import base64
+import hashlib
+import orjson
+import os
 
 class ReviewService:
     """Service for managing code reviews"""
     
-    SUPPORTED_LANGUAGES = ['python', 'javascript', 'java', 'c++', 'cpp', 'c', 'go', 'rust', 'typescript', 'ruby', 'php']
+    SUPPORTED_LANGUAGES = frozenset({'python', 'javascript', 'java', 'c++', 'cpp', 'c', 'go', 'rust', 'typescript', 'ruby', 'php'})
+    _SUPPORTED_LIST = ', '.join(sorted(SUPPORTED_LANGUAGES))
     MAX_CODE_LENGTH = 10000  # characters
+    MAX_BATCH_SIZE = 10  # snippets per batch request
     
-    def __init__(self):
+    def __init__(self, max_batch_size: int = MAX_BATCH_SIZE):
         self.llm_service = LLMService()
+        self.max_batch_size = max_batch_size
+        self.cache_ttl = timedelta(hours=int(os.getenv('REVIEW_CACHE_TTL_HOURS', 168)))
     
     def validate_input(self, code: str, language: str) -> tuple[bool, str]:
         """
@@ -19,14 +29,15 @@ class ReviewService:
         Returns:
             tuple: (is_valid, error_message)
         """
+        # Length first so oversized input is rejected before strip() copies it
+        if code and len(code) > self.MAX_CODE_LENGTH:
+            return False, f"Code snippet too long (max {self.MAX_CODE_LENGTH} characters)"
+        
         if not code or not code.strip():
             return False, "Code snippet cannot be empty"
         
-        if len(code) > self.MAX_CODE_LENGTH:
-            return False, f"Code snippet too long (max {self.MAX_CODE_LENGTH} characters)"
-        
         if not language or language.lower() not in self.SUPPORTED_LANGUAGES:
-            return False, f"Unsupported language. Supported: {', '.join(self.SUPPORTED_LANGUAGES)}"
+            return False, f"Unsupported language. Supported: {self._SUPPORTED_LIST}"
         
         return True, ""
     
@@ -46,11 +57,20 @@ class ReviewService:
         if not is_valid:
             raise ValueError(error_msg)
         
-        # Get review from LLM
-        try:
-            review_data = self.llm_service.review_code(code, language)
-        except Exception as e:
-            raise Exception(f"Failed to generate review: {str(e)}")
+        # Reuse a previous review of the same snippet, otherwise ask the LLM
+        code_hash = self._cache_key(code, language)
+        review_data = self._get_cached_review(code_hash, language.lower())
+        
+        if review_data is None:
+            try:
+                review_data = self.llm_service.review_code(code, language)
+            except Exception as e:
+                raise Exception(f"Failed to generate review: {str(e)}")
+            
+            # Only cache structured LLM reviews; a text fallback from one bad
+            # reply or a TEST_MODE mock must not be served for this code later
+            if review_data.get('source') == 'llm':
+                self._cache_review(code_hash, language.lower(), review_data)
         
         # Save to database
         db = SessionLocal()
@@ -61,14 +81,17 @@ class ReviewService:
                 review_text=review_data['review_text'],
                 suggestions=review_data['suggestions'],
                 potential_bugs=review_data['potential_bugs'],
-                quality_score=review_data['quality_score']
+                quality_score=review_data['quality_score'],
+                created_at=datetime.utcnow()
             )
             
+            # Flush to get the new id (autoflush is off) and serialize the row
+            # before commit; nothing is reloaded afterwards
             db.add(review)
+            db.flush()
+            result = review.to_dict()
             db.commit()
-            db.refresh(review)
             
-            result = review.to_dict()
             result['strengths'] = review_data.get('strengths', [])
             result['reasoning'] = review_data.get('reasoning', '')
             
@@ -80,58 +103,185 @@ class ReviewService:
         finally:
             db.close()
     
+    def create_review_batch(self, items: list) -> list:
+        """
+        Create reviews for several snippets, calling the LLM concurrently
+        
+        Args:
+            items: List of {"code": ..., "language": ...} dicts
+            
+        Returns:
+            list: One result per item, in request order
+        """
+        if not isinstance(items, list) or not items:
+            raise ValueError("Items must be a non-empty list")
+        
+        if len(items) > self.max_batch_size:
+            raise ValueError(f"Too many items (max {self.max_batch_size} per batch)")
+        
+        if not all(isinstance(item, dict) for item in items):
+            raise ValueError("Each item must be an object with code and language")
+        
+        concurrency = int(os.getenv('REVIEW_CONCURRENCY', 8))
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(items))) as executor:
+            return list(executor.map(self._create_batch_item, range(len(items)), items))
+    
+    def _create_batch_item(self, index: int, item: dict) -> dict:
+        """Create one batch review, reporting failures instead of raising"""
+        try:
+            review = self.create_review(item.get('code'), item.get('language'))
+        except Exception as e:
+            return {'index': index, 'success': False, 'error': str(e)}
+        
+        return {'index': index, 'success': True, 'review': review}
+    
+    def _cache_key(self, code: str, language: str) -> str:
+        """Hash of the model and full prompt, so a new model or prompt misses"""
+        prompt = self.llm_service.create_review_prompt(code, language)
+        key = f"{self.llm_service.model}\0{prompt}"
+        return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+    
+    def _get_cached_review(self, code_hash: str, language: str) -> dict | None:
+        """Look up an unexpired cached LLM review for the given key and language"""
+        db = SessionLocal()
+        try:
+            cached = db.get(ReviewCache, (code_hash, language))
+            if cached is None or cached.created_at < datetime.utcnow() - self.cache_ttl:
+                return None
+            return orjson.loads(cached.review_json)
+        finally:
+            db.close()
+    
+    def _cache_review(self, code_hash: str, language: str, review_data: dict) -> None:
+        """Store an LLM review in the cache, ignoring concurrent duplicates"""
+        db = SessionLocal()
+        try:
+            # Evict expired entries, including a stale one for this key
+            db.execute(delete(ReviewCache).where(
+                ReviewCache.created_at < datetime.utcnow() - self.cache_ttl
+            ))
+            db.add(ReviewCache(
+                code_hash=code_hash,
+                language=language,
+                review_json=orjson.dumps(review_data).decode()
+            ))
+            db.commit()
+        except IntegrityError:
+            # Another request cached the same snippet first
+            db.rollback()
+        finally:
+            db.close()
+    
+    @staticmethod
+    def _encode_cursor(review: CodeReview) -> str:
+        """Encode the keyset position of a review as an opaque cursor"""
+        raw = f"{review.created_at.isoformat()}|{review.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+    
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+        """Decode a cursor into its (created_at, id) keyset position"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            created_at, review_id = raw.split('|')
+            return datetime.fromisoformat(created_at), int(review_id)
+        except (ValueError, UnicodeDecodeError):
+            raise ValueError("Invalid cursor")
+    
     def get_reviews(self, page: int = 1, per_page: int = 10, language: str = None, 
-                    start_date: str = None, end_date: str = None) -> dict:
+                    start_date: str = None, end_date: str = None, cursor: str = None) -> dict:
         """
         Get paginated list of reviews with optional filters
         
+        Passing a cursor (the next_cursor of a previous response) uses keyset
+        pagination, which stays fast at any depth. Page-based pagination is
+        kept for compatibility but scans every skipped row.
+        
         Args:
-            page: Page number (1-indexed)
+            page: Page number (1-indexed), ignored when cursor is given
             per_page: Items per page
             language: Filter by language
             start_date: Filter by start date (ISO format)
             end_date: Filter by end date (ISO format)
+            cursor: Position to continue listing from
             
         Returns:
             dict: Paginated reviews
         """
         db = SessionLocal()
         try:
-            query = db.query(CodeReview)
+            filters = []
             
             # Apply filters
             if language:
-                query = query.filter(CodeReview.language == language.lower())
+                filters.append(CodeReview.language == language.lower())
             
             if start_date:
                 try:
                     start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                    query = query.filter(CodeReview.created_at >= start_dt)
+                    filters.append(CodeReview.created_at >= start_dt)
                 except ValueError:
                     pass
             
             if end_date:
                 try:
                     end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-                    query = query.filter(CodeReview.created_at <= end_dt)
+                    filters.append(CodeReview.created_at <= end_dt)
                 except ValueError:
                     pass
             
-            # Get total count
-            total = query.count()
+            order = (desc(CodeReview.created_at), desc(CodeReview.id))
+            
+            if cursor:
+                cursor_ts, cursor_id = self._decode_cursor(cursor)
+                filters.append(or_(
+                    CodeReview.created_at < cursor_ts,
+                    and_(CodeReview.created_at == cursor_ts, CodeReview.id < cursor_id)
+                ))
+                
+                # Fetch one extra row to know whether another page follows
+                reviews = db.scalars(
+                    select(CodeReview)
+                    .where(*filters)
+                    .order_by(*order)
+                    .limit(per_page + 1)
+                ).all()
+                has_more = len(reviews) > per_page
+                reviews = reviews[:per_page]
+                
+                return {
+                    'reviews': [review.to_dict() for review in reviews],
+                    'per_page': per_page,
+                    'next_cursor': self._encode_cursor(reviews[-1]) if has_more else None
+                }
             
-            # Apply pagination
-            reviews = query.order_by(desc(CodeReview.created_at))\
-                          .offset((page - 1) * per_page)\
-                          .limit(per_page)\
-                          .all()
+            # Fetch the page and the total match count in a single query
+            rows = db.execute(
+                select(CodeReview, func.count().over().label('total'))
+                .where(*filters)
+                .order_by(*order)
+                .offset((page - 1) * per_page)
+                .limit(per_page)
+            ).all()
+            
+            if rows:
+                total = rows[0].total
+            else:
+                # Past the last page the window count is unavailable
+                total = db.scalar(
+                    select(func.count()).select_from(CodeReview).where(*filters)
+                )
+            
+            reviews = [row.CodeReview for row in rows]
+            has_more = page * per_page < total
             
             return {
                 'reviews': [review.to_dict() for review in reviews],
                 'total': total,
                 'page': page,
                 'per_page': per_page,
-                'total_pages': (total + per_page - 1) // per_page
+                'total_pages': (total + per_page - 1) // per_page,
+                'next_cursor': self._encode_cursor(reviews[-1]) if has_more and reviews else None
             }
         
         finally:
@@ -149,7 +299,7 @@ class ReviewService:
         """
         db = SessionLocal()
         try:
-            review = db.query(CodeReview).filter(CodeReview.id == review_id).first()
+            review = db.get(CodeReview, review_id)
             
             if not review:
                 raise ValueError(f"Review with ID {review_id} not found")
@@ -171,17 +321,17 @@ class ReviewService:
         """
         db = SessionLocal()
         try:
-            review = db.query(CodeReview).filter(CodeReview.id == review_id).first()
-            
-            if not review:
-                raise ValueError(f"Review with ID {review_id} not found")
-            
-            db.delete(review)
+            # Single DELETE statement, no load into the identity map first
+            result = db.execute(delete(CodeReview).where(CodeReview.id == review_id))
             db.commit()
-            return True
         
         except Exception as e:
             db.rollback()
             raise Exception(f"Failed to delete review: {str(e)}")
         finally:
-            db.close()
\ No newline at end of file
+            db.close()
+        
+        if result.rowcount == 0:
+            raise ValueError(f"Review with ID {review_id} not found")
+        
+        return True
\ No newline at end of file
@@ -1,5 +1,6 @@
 import requests
-import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 
 API_KEY = "sk-nn_jGQlwi-NXYdzhkc4BXw"
 BASE_URL = "https://litellm.dev.asoclab.dev"
@@ -28,17 +29,32 @@ print("=" * 60)
 print("TESTING LITELLM MODELS")
 print("=" * 60)
 
-for model in models_to_test:
-    print(f"\n🔍 Testing: {model}")
+def probe_model(model):
+    """Send a tiny completion request for one model name"""
     payload = {**simple_message, 'model': model}
+    return session.post(
+        f'{BASE_URL}/chat/completions',
+        headers=headers,
+        json=payload,
+        timeout=10
+    )
+
+# Probe every model at once over one pooled session, so the total time is
+# the slowest response rather than the sum of all of them
+session = requests.Session()
+adapter = HTTPAdapter(pool_connections=1, pool_maxsize=len(models_to_test))
+session.mount('http://', adapter)
+session.mount('https://', adapter)
+
+executor = ThreadPoolExecutor(max_workers=len(models_to_test))
+futures = {executor.submit(probe_model, model): model for model in models_to_test}
+
+for future in as_completed(futures):
+    model = futures[future]
+    print(f"\n🔍 Tested: {model}")
     
     try:
-        response = requests.post(
-            f'{BASE_URL}/chat/completions',
-            headers=headers,
-            json=payload,
-            timeout=10
-        )
+        response = future.result()
         
         if response.status_code == 200:
             print(f"✅ SUCCESS! Model '{model}' works!")
@@ -54,4 +70,9 @@ for model in models_to_test:
     except Exception as e:
         print(f"❌ Exception: {str(e)[:100]}")
 
+# Stop waiting on the other probes as soon as one model works. Requests
+# already in flight can't be interrupted, so the script still only exits
+# once they answer or hit their 10 s timeout
+executor.shutdown(wait=False, cancel_futures=True)
+
 print("\n\nIf no model worked, contact the API provider for the correct model name.")
\ No newline at end of file
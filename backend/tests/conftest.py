@@ -0,0 +1,115 @@
+import pytest
+import io
+import os
+
+# Give the services a fake API to point at. .env is loaded after this and
+# does not override variables that are already set
+os.environ.setdefault('LLM_API_KEY', 'test-key')
+os.environ.setdefault('LLM_BASE_URL', 'http://llm.invalid')
+
+# Keep the app's own engine off disk; the tests swap in their own below
+os.environ['DATABASE_URL'] = 'sqlite://'
+
+# Every test shares one connection, so run background work one task at a time
+os.environ['REVIEW_CONCURRENCY'] = '1'
+os.environ['REVIEW_WORKERS'] = '1'
+
+import orjson
+import requests
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import StaticPool
+
+import models
+from app import app
+from extensions import limiter
+from models import init_db, SessionLocal
+from routes.review_routes import review_service
+
+
+# One in-memory database on a single connection that every session shares;
+# each xdist worker process gets its own
+engine = create_engine(
+    'sqlite://',
+    connect_args={'check_same_thread': False},
+    poolclass=StaticPool
+)
+models.engine = engine
+SessionLocal.configure(bind=engine)
+
+
+# pysqlite defers BEGIN and treats the first SAVEPOINT as the transaction, so
+# releasing it would commit; emit BEGIN ourselves so rollback undoes each test
+@event.listens_for(engine, 'connect')
+def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+
+@event.listens_for(engine, 'begin')
+def _emit_begin(conn):
+    conn.exec_driver_sql('BEGIN')
+
+
+@pytest.fixture(scope='session', autouse=True)
+def _init_schema():
+    """Create the schema once per session"""
+    with app.app_context():
+        init_db()
+    yield
+
+
+# The review the stubbed LLM API answers every request with
+CANNED_REVIEW = {
+    'quality_score': 8.0,
+    'review_text': 'Looks fine',
+    'suggestions': '',
+    'potential_bugs': '',
+    'strengths': [],
+    'reasoning': ''
+}
+
+
+def canned_completion(url, **kwargs):
+    """Answer a chat completion request with CANNED_REVIEW"""
+    response = requests.Response()
+    response.status_code = 200
+    response.headers['Content-Type'] = 'application/json'
+    response.raw = io.BytesIO(orjson.dumps({
+        'choices': [{'message': {'content': orjson.dumps(CANNED_REVIEW).decode()}}]
+    }))
+    return response
+
+
+@pytest.fixture(scope='session', autouse=True)
+def _stub_llm():
+    """Serve every LLM API call from the canned completion, never the network"""
+    llm_service = review_service.llm_service
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(llm_service, 'test_mode', False)
+        mp.setattr(llm_service._session, 'post', canned_completion)
+        yield
+
+
+@pytest.fixture(scope='session')
+def _app():
+    """Configure the app for testing"""
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(_app):
+    """Create test client whose database changes are rolled back afterwards"""
+    limiter.reset()
+    
+    connection = engine.connect()
+    transaction = connection.begin()
+    # Service commits release savepoints inside the outer transaction
+    SessionLocal.configure(bind=connection, join_transaction_mode='create_savepoint')
+    
+    try:
+        with _app.test_client() as client:
+            yield client
+    finally:
+        SessionLocal.configure(bind=engine, join_transaction_mode='conservative_savepoint')
+        transaction.rollback()
+        connection.close()
@@ -0,0 +1,215 @@
+import pytest
+
+from services.llm_service import LLMService, _JSONObjectScanner
+import io
+import orjson
+import requests
+
+@pytest.fixture
+def llm_service(monkeypatch):
+    """Create an LLM service that never talks to a real API"""
+    monkeypatch.setenv('LLM_API_KEY', 'test-key')
+    monkeypatch.setenv('LLM_BASE_URL', 'http://llm.invalid')
+    monkeypatch.setenv('TEST_MODE', 'false')
+    return LLMService()
+
+
+def make_response(body: bytes, content_type: str) -> requests.Response:
+    """Build a 200 response with the given body, as if read from the network"""
+    response = requests.Response()
+    response.status_code = 200
+    response.headers['Content-Type'] = content_type
+    response.raw = io.BytesIO(body)
+    return response
+
+
+def sse_body(*events) -> bytes:
+    """Encode SSE data lines, one per event"""
+    return b''.join(b'data: ' + event + b'\n\n' for event in events)
+
+
+def delta(text: str) -> bytes:
+    """Encode a streamed chat completion chunk carrying text"""
+    return orjson.dumps({'choices': [{'delta': {'content': text}}]})
+
+
+class TestJSONObjectScanner:
+    """Tests for the incremental JSON object scanner"""
+    
+    def test_complete_object_across_chunks(self):
+        """Test the object is only reported once its closing brace arrives"""
+        scanner = _JSONObjectScanner()
+        
+        assert scanner.feed('```json\n{"quality_score": 7, ') is False
+        assert scanner.feed('"nested": {"a": 1}') is False
+        assert scanner.feed('}\n```') is True
+        assert orjson.loads(scanner.text) == {'quality_score': 7, 'nested': {'a': 1}}
+    
+    def test_braces_and_escaped_quotes_in_strings(self):
+        """Test braces and escaped quotes inside strings don't end the object"""
+        scanner = _JSONObjectScanner()
+        
+        assert scanner.feed('{"summary": "uses \\"}\\" and {", "quality_score": 1}') is True
+        assert orjson.loads(scanner.text) == {'summary': 'uses "}" and {', 'quality_score': 1}
+    
+    def test_stray_braces_in_prose(self):
+        """Test a brace pair that isn't JSON is skipped for the next object"""
+        scanner = _JSONObjectScanner()
+        
+        assert scanner.feed('Reply in {this} format: ') is False
+        assert scanner.feed('{"quality_score": 5}') is True
+        assert scanner.text == '{"quality_score": 5}'
+    
+    def test_json_without_score_in_prose(self):
+        """Test JSON quoted before the review is not mistaken for the review"""
+        scanner = _JSONObjectScanner()
+        
+        assert scanner.feed('It returns an empty dict {} or {"a": {"b": 1}} when unset.\n') is False
+        assert scanner.feed('```json\n{"quality_score": 6, "summary": "ok"}\n```') is True
+        assert orjson.loads(scanner.text) == {'quality_score': 6, 'summary': 'ok'}
+    
+    def test_unbalanced_object(self):
+        """Test an object that never closes is not reported"""
+        scanner = _JSONObjectScanner()
+        
+        assert scanner.feed('{"quality_score": 5, "summary": "cut off') is False
+        assert scanner.text is None
+
+
+class TestReadContent:
+    """Tests for reading streamed and regular LLM responses"""
+    
+    def test_stream_stops_at_complete_object(self, llm_service):
+        """Test the review object is returned, ignoring the text after it"""
+        response = make_response(sse_body(
+            delta('```json\n{"quality_score": '),
+            delta('8}'),
+            delta('\n```'),
+            b'[DONE]'
+        ), 'text/event-stream')
+        
+        assert llm_service._read_content(response) == '{"quality_score": 8}'
+        # Drained rather than closed, so the connection can be reused
+        assert response.raw.closed is False
+    
+    def test_stream_done_without_object(self, llm_service):
+        """Test the whole text is returned when no object ever balances"""
+        response = make_response(sse_body(
+            delta('The code looks '),
+            delta('fine, score 7'),
+            b'[DONE]',
+            delta('ignored after done')
+        ), 'text/event-stream')
+        
+        assert llm_service._read_content(response) == 'The code looks fine, score 7'
+    
+    def test_stream_skips_non_chunk_lines(self, llm_service):
+        """Test comments, bad JSON and non-object data lines are skipped"""
+        body = (
+            b': keep-alive\n\n'
+            + sse_body(b'not json', b'[1, 2]', b'"text"', b'{"choices": []}', delta('{"a": 1}'))
+        )
+        response = make_response(body, 'text/event-stream')
+        
+        assert llm_service._read_content(response) == '{"a": 1}'
+    
+    def test_non_stream_fallback(self, llm_service):
+        """Test a regular JSON completion is read when the proxy doesn't stream"""
+        body = orjson.dumps({'choices': [{'message': {'content': '{"quality_score": 6}'}}]})
+        response = make_response(body, 'application/json')
+        
+        assert llm_service._read_content(response) == '{"quality_score": 6}'
+
+
+class TestReviewCodeParsing:
+    """Tests for extracting the review JSON from an LLM reply"""
+    
+    @pytest.fixture
+    def reply_with(self, llm_service, monkeypatch):
+        """Make the LLM API answer with the given message content"""
+        def reply(content):
+            body = orjson.dumps({'choices': [{'message': {'content': content}}]})
+            monkeypatch.setattr(
+                llm_service._session, 'post',
+                lambda *args, **kwargs: make_response(body, 'application/json')
+            )
+        return reply
+    
+    def test_json_fence(self, llm_service, reply_with):
+        """Test JSON inside a ```json fence is parsed"""
+        reply_with('Here is my review:\n```json\n{"quality_score": 7, "summary": "ok"}\n```\nThanks')
+        
+        review = llm_service.review_code('x = 1', 'python')
+        assert review['source'] == 'llm'
+        assert review['quality_score'] == 7.0
+        assert review['review_text'] == 'ok'
+    
+    def test_bare_fence(self, llm_service, reply_with):
+        """Test JSON inside an untagged ``` fence is parsed"""
+        reply_with('```\n{"quality_score": 4, "summary": "bare"}\n```')
+        
+        review = llm_service.review_code('x = 1', 'python')
+        assert review['source'] == 'llm'
+        assert review['review_text'] == 'bare'
+    
+    def test_unterminated_fence(self, llm_service, reply_with):
+        """Test an unterminated fence falls back to a text review"""
+        reply_with('```json\n{"quality_score": 9, "summary": "cut off"}')
+        
+        review = llm_service.review_code('x = 1', 'python')
+        assert review['source'] == 'fallback'
+        assert 'cut off' in review['reasoning']
+
+
+    def test_malformed_body_is_retried(self, llm_service, monkeypatch):
+        """Test a 200 that isn't a chat completion is retried, then reported"""
+        calls = []
+        
+        def post(*args, **kwargs):
+            calls.append(1)
+            return make_response(b'<html>Bad gateway</html>', 'text/html')
+        
+        monkeypatch.setattr(llm_service._session, 'post', post)
+        monkeypatch.setattr('services.llm_service.time.sleep', lambda seconds: None)
+        
+        with pytest.raises(Exception, match='Invalid API response'):
+            llm_service.review_code('x = 1', 'python')
+        assert len(calls) == 3
+
+
+class TestMockReview:
+    """Tests for the TEST_MODE mock reviewer heuristics"""
+    
+    def test_missing_semicolon_substring_match(self, llm_service):
+        """Test statement keywords match as substrings, e.g. printf in sprintf"""
+        review = llm_service._create_mock_review('char buf[8];\nsprintf(buf, "%d", 1)', 'c')
+        
+        assert 'Missing semicolon at line 2: "sprintf(buf, "%d", 1)"' in review['potential_bugs']
+    
+    def test_block_lines_not_flagged(self, llm_service):
+        """Test lines opening blocks are not treated as statements"""
+        review = llm_service._create_mock_review('for (int i = 0; i < 3; i++)\n    total += i;', 'java')
+        
+        assert 'Missing semicolon' not in review['potential_bugs']
+    
+    def test_language_without_semicolons(self, llm_service):
+        """Test the semicolon check only runs for C-like languages"""
+        review = llm_service._create_mock_review('x = 1\nreturn x', 'python')
+        
+        assert 'Missing semicolon' not in review['potential_bugs']
+    
+    def test_skipped_lines_and_line_number(self, llm_service):
+        """Test comments, brace-only and terminated lines are skipped in one pass"""
+        code = (
+            'function main() {\r\n'
+            '    // let note = 1\r\n'
+            '    let total = 0;\r\n'
+            '}\r\n'
+            'let result = total\r\n'
+            'console.log(result)'
+        )
+        review = llm_service._create_mock_review(code, 'javascript')
+        
+        # Only the first offending line is reported, with CRLF stripped
+        assert review['potential_bugs'] == 'Missing semicolon at line 5: "let result = total"'
+        assert 'Well-organized multi-line code' in review['strengths']
@@ -1,43 +1,23 @@
 import pytest
-import sys
-import os
+from datetime import timedelta
 
-# Add parent directory to path
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from routes.review_routes import review_service, job_service
+from tests.conftest import CANNED_REVIEW
 
-from app import app
-from models import init_db, SessionLocal, CodeReview
-import json
 
-@pytest.fixture
-def client():
-    """Create test client"""
-    app.config['TESTING'] = True
-    
-    # Initialize test database
-    with app.app_context():
-        init_db()
-    
-    with app.test_client() as client:
-        yield client
-    
-    # Cleanup
-    db = SessionLocal()
-    try:
-        db.query(CodeReview).delete()
-        db.commit()
-    finally:
-        db.close()
+def wait_for_jobs():
+    """Block until every queued review job has run"""
+    job_service._executor.submit(lambda: None).result()
+
 
 @pytest.fixture
 def sample_review(client):
     """Create a sample review for testing"""
     response = client.post('/api/review', 
-        data=json.dumps({
+        json={
             'code': 'def hello():\n    print("Hello World")',
             'language': 'python'
-        }),
-        content_type='application/json'
+        }
     )
     
     if response.status_code == 201:
@@ -62,11 +42,10 @@ class TestReviewCreation:
     def test_create_review_success(self, client):
         """Test successful review creation"""
         response = client.post('/api/review',
-            data=json.dumps({
+            json={
                 'code': 'def add(a, b):\n    return a + b',
                 'language': 'python'
-            }),
-            content_type='application/json'
+            }
         )
         
         assert response.status_code == 201
@@ -76,64 +55,225 @@ class TestReviewCreation:
         assert 'quality_score' in data['review']
         assert 'review_text' in data['review']
     
-    def test_create_review_missing_code(self, client):
-        """Test review creation without code"""
-        response = client.post('/api/review',
-            data=json.dumps({
-                'language': 'python'
-            }),
-            content_type='application/json'
-        )
+    def _count_llm_calls(self, monkeypatch, source):
+        """Replace the LLM call with a canned review from the given source"""
+        calls = []
+        
+        def counting_review_code(code, language):
+            calls.append(code)
+            return {**CANNED_REVIEW, 'source': source}
+        
+        monkeypatch.setattr(review_service.llm_service, 'review_code', counting_review_code)
+        return calls
+    
+    def test_create_review_uses_cache(self, client, monkeypatch):
+        """Test identical snippets are only sent to the LLM once"""
+        calls = self._count_llm_calls(monkeypatch, 'llm')
+        
+        for _ in range(2):
+            response = client.post('/api/review',
+                json={
+                    'code': 'def answer():\n    return 42',
+                    'language': 'python'
+                }
+            )
+            assert response.status_code == 201
+        
+        assert len(calls) == 1
+    
+    def test_create_review_cache_keyed_by_model(self, client, monkeypatch):
+        """Test switching LLM model doesn't serve the old model's review"""
+        calls = self._count_llm_calls(monkeypatch, 'llm')
+        
+        for model in ('model-a', 'model-b'):
+            monkeypatch.setattr(review_service.llm_service, 'model', model)
+            response = client.post('/api/review',
+                json={
+                    'code': 'def answer():\n    return 42',
+                    'language': 'python'
+                }
+            )
+            assert response.status_code == 201
+        
+        assert len(calls) == 2
+    
+    def test_create_review_cache_expires(self, client, monkeypatch):
+        """Test a cached review older than the TTL is replaced"""
+        calls = self._count_llm_calls(monkeypatch, 'llm')
+        monkeypatch.setattr(review_service, 'cache_ttl', timedelta(0))
+        
+        for _ in range(2):
+            response = client.post('/api/review',
+                json={
+                    'code': 'def answer():\n    return 42',
+                    'language': 'python'
+                }
+            )
+            assert response.status_code == 201
+        
+        assert len(calls) == 2
+    
+    @pytest.mark.parametrize('source', ['fallback', 'mock'])
+    def test_create_review_skips_cache_for_unstructured(self, client, monkeypatch, source):
+        """Test fallback and mock reviews are never cached"""
+        calls = self._count_llm_calls(monkeypatch, source)
+        
+        for _ in range(2):
+            response = client.post('/api/review',
+                json={
+                    'code': 'def answer():\n    return 42',
+                    'language': 'python'
+                }
+            )
+            assert response.status_code == 201
+            assert 'source' not in response.get_json()['review']
+        
+        assert len(calls) == 2
+    
+    @pytest.mark.parametrize('body', [
+        {'json': {'language': 'python'}},
+        {'json': {'code': 'print("hello")'}},
+        {'json': {'code': '', 'language': 'python'}},
+        {'json': {'code': 'some code', 'language': 'brainfuck'}},
+        {'data': 'not json', 'content_type': 'text/plain'},
+    ], ids=['missing_code', 'missing_language', 'empty_code', 'unsupported_language', 'no_json'])
+    def test_create_review_invalid(self, client, body):
+        """Test review creation rejects an invalid request body"""
+        response = client.post('/api/review', **body)
         
         assert response.status_code == 400
         data = response.get_json()
         assert 'error' in data
+
+
+class TestReviewBatch:
+    """Tests for POST /api/review/batch endpoint"""
     
-    def test_create_review_missing_language(self, client):
-        """Test review creation without language"""
-        response = client.post('/api/review',
-            data=json.dumps({
-                'code': 'print("hello")'
-            }),
-            content_type='application/json'
+    def test_create_review_batch(self, client):
+        """Test batch results are returned per item, in request order"""
+        response = client.post('/api/review/batch',
+            json={
+                'items': [
+                    {'code': 'def add(a, b):\n    return a + b', 'language': 'python'},
+                    {'code': 'some code', 'language': 'brainfuck'}
+                ]
+            }
+        )
+        
+        assert response.status_code == 200
+        results = response.get_json()['results']
+        assert [r['index'] for r in results] == [0, 1]
+        assert results[0]['success'] is True
+        assert 'quality_score' in results[0]['review']
+        assert results[1]['success'] is False
+        assert 'error' in results[1]
+    
+    def test_create_review_batch_max_size(self, client):
+        """Test a batch of the maximum size fits within the rate limit"""
+        size = review_service.max_batch_size
+        
+        response = client.post('/api/review/batch',
+            json={
+                'items': [{'code': f'print({i})', 'language': 'python'} for i in range(size)]
+            }
+        )
+        
+        assert response.status_code == 200
+        assert len(response.get_json()['results']) == size
+    
+    def test_create_review_batch_too_many_items(self, client):
+        """Test an oversized batch is rejected as invalid, not rate limited"""
+        response = client.post('/api/review/batch',
+            json={
+                'items': [{'code': f'print({i})', 'language': 'python'} for i in range(25)]
+            }
         )
         
         assert response.status_code == 400
-        data = response.get_json()
-        assert 'error' in data
+        assert 'Too many items' in response.get_json()['error']
     
-    def test_create_review_empty_code(self, client):
-        """Test review creation with empty code"""
+    def test_create_review_batch_empty(self, client):
+        """Test batch with no items"""
+        response = client.post('/api/review/batch',
+            json={'items': []}
+        )
+        
+        assert response.status_code == 400
+
+
+class TestReviewJobs:
+    """Tests for asynchronous POST /api/review and GET /api/review/<job_id>"""
+    
+    def test_create_review_async(self, client):
+        """Test queuing a review and polling it to completion"""
         response = client.post('/api/review',
-            data=json.dumps({
-                'code': '',
+            json={
+                'code': 'def add(a, b):\n    return a + b',
                 'language': 'python'
-            }),
-            content_type='application/json'
+            },
+            headers={'Prefer': 'respond-async'}
         )
         
-        assert response.status_code == 400
+        assert response.status_code == 202
+        job = response.get_json()['job']
+        assert response.headers['Location'] == f"/api/review/{job['id']}"
+        
+        wait_for_jobs()
+        job = client.get(f"/api/review/{job['id']}").get_json()['job']
+        
+        assert job['status'] == 'finished'
+        assert job['review']['id'] == job['review_id']
+        assert 'quality_score' in job['review']
     
-    def test_create_review_unsupported_language(self, client):
-        """Test review creation with unsupported language"""
+    def test_create_review_async_records_failure(self, client, monkeypatch):
+        """Test a job that fails to start is marked failed, not left queued"""
+        update_job = job_service._update_job
+        
+        def failing_update_job(job_id, **values):
+            if values.get('status') == 'running':
+                raise RuntimeError('database unavailable')
+            update_job(job_id, **values)
+        
+        monkeypatch.setattr(job_service, '_update_job', failing_update_job)
+        
         response = client.post('/api/review',
-            data=json.dumps({
-                'code': 'some code',
-                'language': 'brainfuck'
-            }),
-            content_type='application/json'
+            json={
+                'code': 'def sub(a, b):\n    return a - b',
+                'language': 'python'
+            },
+            headers={'Prefer': 'respond-async'}
         )
+        job = response.get_json()['job']
         
-        assert response.status_code == 400
+        wait_for_jobs()
+        job = client.get(f"/api/review/{job['id']}").get_json()['job']
+        
+        assert job['status'] == 'failed'
+        assert 'database unavailable' in job['error']
     
-    def test_create_review_no_json(self, client):
-        """Test review creation without JSON body"""
+    def test_create_review_async_invalid_input(self, client):
+        """Test invalid input is rejected before a job is queued"""
         response = client.post('/api/review',
-            data='not json',
-            content_type='text/plain'
+            json={
+                'code': 'some code',
+                'language': 'brainfuck'
+            },
+            headers={'Prefer': 'respond-async'}
         )
         
         assert response.status_code == 400
+    
+    def test_get_review_job_not_rate_limited(self, client):
+        """Test polling a job is not cut off by the default hourly limit"""
+        for _ in range(105):
+            response = client.get('/api/review/doesnotexist')
+            assert response.status_code == 404
+    
+    def test_get_review_job_not_found(self, client):
+        """Test polling a non-existent job"""
+        response = client.get('/api/review/doesnotexist')
+        
+        assert response.status_code == 404
 
 
 class TestReviewRetrieval:
@@ -170,6 +310,54 @@ class TestReviewRetrieval:
         assert data['data']['page'] == 1
         assert data['data']['per_page'] == 5
     
+    def test_get_reviews_total_across_pages(self, client):
+        """Test total is reported on every page, including past the end"""
+        for i in range(3):
+            client.post('/api/review',
+                json={
+                    'code': f'print({i})',
+                    'language': 'python'
+                }
+            )
+        
+        data = client.get('/api/reviews?page=2&per_page=2').get_json()
+        assert len(data['data']['reviews']) == 1
+        assert data['data']['total'] == 3
+        assert data['data']['total_pages'] == 2
+        
+        data = client.get('/api/reviews?page=5&per_page=2').get_json()
+        assert len(data['data']['reviews']) == 0
+        assert data['data']['total'] == 3
+    
+    def test_get_reviews_cursor_pagination(self, client):
+        """Test walking the reviews with next_cursor"""
+        for i in range(3):
+            client.post('/api/review',
+                json={
+                    'code': f'print({i})',
+                    'language': 'python'
+                }
+            )
+        
+        first = client.get('/api/reviews?per_page=2').get_json()['data']
+        assert len(first['reviews']) == 2
+        assert first['next_cursor']
+        
+        response = client.get(f"/api/reviews?per_page=2&cursor={first['next_cursor']}")
+        assert response.status_code == 200
+        second = response.get_json()['data']
+        assert len(second['reviews']) == 1
+        assert second['next_cursor'] is None
+        
+        seen = [r['id'] for r in first['reviews'] + second['reviews']]
+        assert len(set(seen)) == 3
+    
+    def test_get_reviews_invalid_cursor(self, client):
+        """Test with a malformed cursor"""
+        response = client.get('/api/reviews?cursor=not-a-cursor')
+        
+        assert response.status_code == 400
+    
     def test_get_reviews_invalid_page(self, client):
         """Test with invalid page number"""
         response = client.get('/api/reviews?page=0')